@@ -1,95 +1,331 @@
 #!/usr/bin/env python3
 import os
-import re
 import shutil
 import tempfile
 import subprocess
 import argparse
-import ast
+import io
+import tokenize
+import mmap
+import posixpath
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-# Known patterns for other languages (unsafe removal)
+# RE2 matches in linear time, so adversarial inputs (e.g. thousands of
+# unterminated "/*") can't trigger backtracking blowups; fall back to re
+try:
+    import re2 as re
+
+    def compile_regex(pattern):
+        # Latin-1 makes RE2 match byte by byte like re; in its default UTF-8
+        # mode an invalid byte would stop [^\n]* short of the end of a comment
+        options = re.Options()
+        options.encoding = re.Options.Encoding.LATIN1
+        return re.compile(pattern, options)
+except ImportError:
+    import re
+
+    compile_regex = re.compile
+
+# Hyperscan scans for every comment opener of an extension in one SIMD pass
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# The Rust regex engine (via rure) uses literal prefilters that suit these
+# patterns well; used when Hyperscan isn't available
+try:
+    import rure
+except ImportError:
+    rure = None
+
+# (opener, closer) pairs; a closer of None means the comment runs to end of line
+LINE_SLASH = (b"//", None)
+LINE_HASH = (b"#", None)
+BLOCK_C = (b"/*", b"*/")
+BLOCK_HTML = (b"<!--", b"-->")
+
+# Known comment syntax for other languages (unsafe removal)
+COMMENT_DELIMITERS = {
+    ".c": (LINE_SLASH, BLOCK_C),
+    ".cpp": (LINE_SLASH, BLOCK_C),
+    ".java": (LINE_SLASH, BLOCK_C),
+    ".js": (LINE_SLASH, BLOCK_C),
+    ".ts": (LINE_SLASH, BLOCK_C),
+    ".go": (LINE_SLASH, BLOCK_C),
+    ".php": (LINE_SLASH, BLOCK_C, LINE_HASH),
+    ".html": (BLOCK_HTML,),
+    ".css": (BLOCK_C,),
+}
+
+# Escaping only true metacharacters keeps the pattern source valid for re, re2
+# and rure alike (the Rust parser rejects escapes such as "\/" or "\#")
+REGEX_META = frozenset(b"\\.^$|?*+()[]{}")
+
+def escape_literal(literal):
+    return b"".join(b"\\" + bytes([c]) if c in REGEX_META else bytes([c]) for c in literal)
+
+def delimiter_pattern(opener, closer):
+    if closer is None:
+        return escape_literal(opener) + rb"[^\n]*"
+    return escape_literal(opener) + rb".*?" + escape_literal(closer)
+
+# One alternation per extension so each file is scanned in a single pass.
+# Patterns are bytes so files never go through a decode/encode round trip
 COMMENT_PATTERNS = {
-    ".c": [r"//.*", r"/\*[\s\S]*?\*/"],
-    ".cpp": [r"//.*", r"/\*[\s\S]*?\*/"],
-    ".java": [r"//.*", r"/\*[\s\S]*?\*/"],
-    ".js": [r"//.*", r"/\*[\s\S]*?\*/"],
-    ".ts": [r"//.*", r"/\*[\s\S]*?\*/"],
-    ".sh": [r"#.*"],
-    ".rb": [r"#.*"],
-    ".go": [r"//.*", r"/\*[\s\S]*?\*/"],
-    ".php": [r"//.*", r"/\*[\s\S]*?\*/", r"#.*"],
-    ".html": [r"<!--[\s\S]*?-->"],
-    ".css": [r"/\*[\s\S]*?\*/"],
+    ext: b"|".join(delimiter_pattern(*d) for d in delimiters)
+    for ext, delimiters in COMMENT_DELIMITERS.items()
 }
 
-def remove_comments_python_safe(file_path, dest_folder=None):
-    """Safely remove comments from Python code while keeping docstrings."""
-    # Backup
+# Languages whose only comment syntax is "#"; whole comment lines are dropped
+# with plain string ops instead of going through the regex engine
+HASH_COMMENT_EXTS = {".sh", ".rb"}
+
+# Every comment starts with one of these; a file containing none of them can
+# skip the regex engine entirely (find() is a fast memchr-based search)
+COMMENT_MARKERS = {
+    **{ext: tuple(opener for opener, _ in delimiters) for ext, delimiters in COMMENT_DELIMITERS.items()},
+    **{ext: (b"#",) for ext in HASH_COMMENT_EXTS},
+}
+
+# Compiled once at import so each file doesn't pay for pattern lookup/compilation.
+# Most extensions share a syntax, so each distinct pattern is compiled only once.
+# Flags are inline so the same source works with both re2 and re
+UNIQUE_PATTERNS = {
+    pattern: compile_regex(b"(?ms)" + pattern)
+    for pattern in set(COMMENT_PATTERNS.values())
+}
+COMPILED_PATTERNS = {
+    ext: UNIQUE_PATTERNS[pattern]
+    for ext, pattern in COMMENT_PATTERNS.items()
+}
+
+def build_hyperscan_database(delimiters):
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[opener for opener, _ in delimiters],
+        ids=list(range(len(delimiters))),
+        elements=len(delimiters),
+        literal=True,
+    )
+    return db
+
+if hyperscan is not None:
+    UNIQUE_DATABASES = {
+        delimiters: build_hyperscan_database(delimiters)
+        for delimiters in set(COMMENT_DELIMITERS.values())
+    }
+    HYPERSCAN_DATABASES = {
+        ext: UNIQUE_DATABASES[delimiters]
+        for ext, delimiters in COMMENT_DELIMITERS.items()
+    }
+else:
+    HYPERSCAN_DATABASES = {}
+
+if rure is not None:
+    # flags=0 turns off Unicode mode so matching is byte-oriented like the others
+    UNIQUE_RURE_PATTERNS = {
+        pattern: rure.Rure(b"(?ms)" + pattern, flags=0)
+        for pattern in set(COMMENT_PATTERNS.values())
+    }
+    RURE_PATTERNS = {
+        ext: UNIQUE_RURE_PATTERNS[pattern]
+        for ext, pattern in COMMENT_PATTERNS.items()
+    }
+else:
+    RURE_PATTERNS = {}
+
+# Files at least this large are mapped instead of read. Hyperscan and the
+# stdlib re engine can scan an mmap in place; re2 and rure only accept real bytes
+MMAP_THRESHOLD = 1 << 20
+if hyperscan is not None or (rure is None and re.__name__ == "re"):
+    MMAP_EXTS = set(COMMENT_DELIMITERS)
+else:
+    MMAP_EXTS = set()
+
+def backup_file(file_path):
+    """Copy file_path to file_path.bak, in the kernel via copy_file_range when possible."""
+    backup_path = f"{file_path}.bak"
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(file_path, "rb") as src, open(backup_path, "wb") as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                size = remaining
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        # Some filesystems report 0 instead of failing; the copy is incomplete
+                        raise OSError("copy_file_range copied nothing")
+                    remaining -= copied
+            if os.path.getsize(backup_path) != size:
+                raise OSError("backup size does not match source")
+            shutil.copystat(file_path, backup_path)
+            return
+        except OSError:
+            pass  # e.g. unsupported filesystem or old kernel; fall back below
+    shutil.copy2(file_path, backup_path)
+
+def prepare_output(file_path, dest_folder=None):
+    """Return (output_path, in_place), backing up the source if it will be overwritten."""
     if dest_folder:
         os.makedirs(dest_folder, exist_ok=True)
-        backup_path = os.path.join(dest_folder, os.path.basename(file_path))
+        output_path = os.path.join(dest_folder, os.path.basename(file_path))
     else:
-        backup_path = f"{file_path}.bak"
-    shutil.copy2(file_path, backup_path)
+        output_path = file_path
+
+    # A dest folder can still resolve to the file's own directory, so compare
+    # the files themselves rather than the paths. Writing elsewhere never
+    # touches the source, so no backup is needed there
+    in_place = os.path.exists(output_path) and os.path.samefile(file_path, output_path)
+    if in_place:
+        backup_file(file_path)
+    return output_path, in_place
+
+def write_output(output_path, data):
+    """Write bytes to output_path with raw os.write calls, bypassing Python's IO buffering."""
+    fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        if data and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, len(data))
+            except OSError:
+                pass  # Not supported by every filesystem; the write still works
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def strip_python_comments(lines):
+    """Return the source text with comments removed, using the tokenizer."""
+    # Tokenize the same lines we rebuild from so row numbers line up. Docstrings
+    # and other strings are STRING tokens, so a "#" inside them is never a COMMENT
+    line_iter = iter(lines)
+    comment_cols = [None] * len(lines)
+    for tok in tokenize.generate_tokens(line_iter.__next__):
+        if tok.type == tokenize.COMMENT:
+            comment_cols[tok.start[0] - 1] = tok.start[1]
 
-    with open(file_path, "r", encoding="utf-8") as f:
+    # Remove comments, dropping lines that held nothing else. Kept lines go
+    # straight into one buffer with their original line endings
+    buf = io.StringIO()
+    for line, col in zip(lines, comment_cols):
+        if col is not None:
+            code = line[:col].rstrip()
+            if not code:
+                continue
+            line = code + line[len(line.rstrip("\r\n")):]
+        buf.write(line)
+    return buf.getvalue()
+
+def remove_comments_python_safe(file_path, dest_folder=None):
+    """Safely remove comments from Python code while keeping docstrings."""
+    output_path, in_place = prepare_output(file_path, dest_folder)
+
+    # newline="" keeps CRLF endings as-is so they survive the round trip
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
         source = f.read()
 
-    tree = ast.parse(source)
-    lines = source.splitlines()
-
-    # Detect docstrings to protect
-    docstrings = {}
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Module)):
-            doc = ast.get_docstring(node)
-            if doc:
-                doc_start = node.body[0].lineno - 1
-                doc_end = doc_start + len(doc.splitlines())
-                docstrings[(doc_start, doc_end)] = True
-
-    # Remove comments
-    new_lines = []
-    for i, line in enumerate(lines):
-        if any(start <= i <= end for start, end in docstrings.keys()):
-            new_lines.append(line)
-            continue
-        stripped = line.strip()
-        if stripped.startswith("#"):
-            continue
-        new_lines.append(line)
+    # Without a "#" there can't be any COMMENT token, so skip tokenizing
+    if "#" in source:
+        # Split only where the tokenizer does (unlike str.splitlines, which
+        # also breaks on form feeds and other separators), keeping the endings
+        new_source = strip_python_comments(io.StringIO(source, newline="").readlines())
+    else:
+        new_source = source
 
     # Save output
-    output_path = os.path.join(dest_folder, os.path.basename(file_path)) if dest_folder else file_path
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(new_lines))
-    print(f"Processed safely: {file_path} -> {output_path}")
+    write_output(output_path, new_source.encode("utf-8"))
+    if not in_place:
+        shutil.copymode(file_path, output_path)
+    return f"Processed safely: {file_path} -> {output_path}"
+
+def remove_comments_hyperscan(data, ext):
+    """Strip comments by locating every opener with Hyperscan in one pass."""
+    delimiters = COMMENT_DELIMITERS[ext]
+    hits = []
+
+    def on_match(idx, start, end, flags, context):
+        hits.append((end - len(delimiters[idx][0]), idx))
+
+    HYPERSCAN_DATABASES[ext].scan(data, match_event_handler=on_match)
+    hits.sort()
+
+    # Resolve each opener to its comment span, leftmost first like re.sub,
+    # and copy only the bytes between spans
+    out = bytearray()
+    pos = 0
+    # Closers known to be absent from the rest of the data; later openers
+    # can't be closed either, so skipping them keeps this linear
+    missing_closers = set()
+    for start, idx in hits:
+        if start < pos:
+            continue
+        opener, closer = delimiters[idx]
+        if closer is None:
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+        else:
+            if closer in missing_closers:
+                continue
+            end = data.find(closer, start + len(opener))
+            if end == -1:
+                missing_closers.add(closer)
+                continue
+            end += len(closer)
+        out += data[pos:start]
+        pos = end
+    out += data[pos:]
+    return bytes(out)
+
+def remove_comments_rure(data, ext):
+    """Strip comments using the Rust regex engine, copying the bytes between matches."""
+    out = bytearray()
+    pos = 0
+    for match in RURE_PATTERNS[ext].find_iter(data):
+        out += data[pos:match.start]
+        pos = match.end
+    out += data[pos:]
+    return bytes(out)
+
+def remove_comments_from_text(data, ext):
+    """Strip comments from raw source bytes (or an mmap of them) based on the file extension."""
+    if all(data.find(marker) == -1 for marker in COMMENT_MARKERS[ext]):
+        return data
+    if ext in HASH_COMMENT_EXTS:
+        return b"\n".join(line for line in data.split(b"\n") if not line.lstrip().startswith(b"#"))
+    if ext in HYPERSCAN_DATABASES:
+        return remove_comments_hyperscan(data, ext)
+    if ext in RURE_PATTERNS:
+        return remove_comments_rure(data, ext)
+    return COMPILED_PATTERNS[ext].sub(b'', data)
 
 def remove_comments_other(file_path, ext, dest_folder=None):
     """Remove comments using regex (unsafe for some cases)."""
-    patterns = COMMENT_PATTERNS.get(ext.lower(), [])
-    if not patterns:
+    ext = ext.lower()
+    if ext not in COMPILED_PATTERNS and ext not in HASH_COMMENT_EXTS:
         return
 
-    # Backup
-    if dest_folder:
-        os.makedirs(dest_folder, exist_ok=True)
-        backup_path = os.path.join(dest_folder, os.path.basename(file_path))
-    else:
-        backup_path = f"{file_path}.bak"
-    shutil.copy2(file_path, backup_path)
+    output_path, in_place = prepare_output(file_path, dest_folder)
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        for pattern in patterns:
-            content = re.sub(pattern, '', content, flags=re.MULTILINE)
-        output_path = os.path.join(dest_folder, os.path.basename(file_path)) if dest_folder else file_path
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f"Processed: {file_path} -> {output_path}")
+        with open(file_path, "rb") as f:
+            # Never map when rewriting in place: truncating the output would
+            # pull the pages out from under the mapping
+            if (ext in MMAP_EXTS and not in_place
+                    and os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD):
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    write_output(output_path, remove_comments_from_text(mm, ext))
+            else:
+                write_output(output_path, remove_comments_from_text(f.read(), ext))
+        if not in_place:
+            shutil.copymode(file_path, output_path)
+        return f"Processed: {file_path} -> {output_path}"
     except Exception as e:
-        print(f"Error processing {file_path}: {e}")
+        return f"Error processing {file_path}: {e}"
 
 def is_text_file(filepath, blocksize=512):
     try:
@@ -100,31 +336,93 @@ def is_text_file(filepath, blocksize=512):
         return False
 
 def process_file(file_path, dest_folder=None):
-    if not is_text_file(file_path):
-        return
-    ext = os.path.splitext(file_path)[1]
-    if ext.lower() == ".py":
-        remove_comments_python_safe(file_path, dest_folder=dest_folder)
-    else:
-        remove_comments_other(file_path, ext, dest_folder=dest_folder)
+    """Process one file and return its status message (None if it was skipped)."""
+    # Decide on the extension first so unsupported files cost no I/O; the
+    # regex languages are trusted to be text and only .py gets the NUL sniff
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".py":
+        if is_text_file(file_path):
+            return remove_comments_python_safe(file_path, dest_folder=dest_folder)
+    elif ext in COMPILED_PATTERNS or ext in HASH_COMMENT_EXTS:
+        return remove_comments_other(file_path, ext, dest_folder=dest_folder)
+    return None
+
+def print_result(message):
+    if message:
+        print(message)
+
+def iter_files(directory):
+    """Yield DirEntry objects for every file under directory, skipping .git."""
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return  # Unreadable directory: skip it, as os.walk does
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name == '.git':
+                    continue
+                yield from iter_files(entry.path)
+            elif entry.is_file():
+                yield entry
 
 def process_directory(directory, dest_folder=None):
-    for root, _, files in os.walk(directory):
-        if '.git' in root.split(os.sep):
-            continue
-        for file in files:
-            process_file(os.path.join(root, file), dest_folder=dest_folder)
+    # DirEntry already carries the name, so unsupported extensions are
+    # filtered here without extra stat/path calls or shipping them to workers
+    supported = {".py", *COMPILED_PATTERNS, *HASH_COMMENT_EXTS}
+    paths = [
+        entry.path for entry in iter_files(directory)
+        if os.path.splitext(entry.name)[1].lower() in supported
+    ]
+
+    # Output is flattened to dest_folder/basename, so files sharing a name would
+    # race on the same output path. Those run serially in walk order afterwards
+    # (the last one walked wins); everything else is independent
+    clashing = []
+    if dest_folder:
+        name_counts = Counter(os.path.basename(path) for path in paths)
+        clashing = [path for path in paths if name_counts[os.path.basename(path)] > 1]
+        paths = [path for path in paths if name_counts[os.path.basename(path)] == 1]
+
+    # Spread the independent files across processes. Workers return their
+    # messages and only the parent prints, so lines can't interleave on a pipe
+    with ProcessPoolExecutor() as executor:
+        for message in executor.map(partial(process_file, dest_folder=dest_folder), paths, chunksize=32):
+            print_result(message)
+    for path in clashing:
+        print_result(process_file(path, dest_folder=dest_folder))
+
+def sparse_checkout_pattern(path):
+    """Turn a repo-relative path into a sparse-checkout pattern matching only that file."""
+    # Patterns are gitignore-style: normalize "./sub/a.c" and escape wildcard
+    # characters so names like "pages/[id].js" are taken literally
+    path = posixpath.normpath(path.replace(os.sep, "/")).lstrip("/")
+    escaped = "".join("\\" + c if c in "\\*?[" else c for c in path)
+    if escaped.startswith(("!", "#")):
+        escaped = "\\" + escaped
+    if escaped.endswith(" "):
+        escaped = escaped[:-1] + "\\ "  # Trailing spaces are dropped unless escaped
+    return "/" + escaped
 
 def process_git_repo(repo_url, files_to_process=None, output_folder="processed_repo"):
     temp_dir = tempfile.mkdtemp()
     try:
-        subprocess.run(["git", "clone", repo_url, temp_dir], check=True)
+        # Only the latest snapshot is needed: skip history, and fetch blobs lazily
+        clone_cmd = ["git", "clone", "--depth", "1", "--single-branch", "--filter=blob:none"]
+        if files_to_process:
+            # Materialize just the requested paths
+            subprocess.run(clone_cmd + ["--no-checkout", repo_url, temp_dir], check=True)
+            patterns = [sparse_checkout_pattern(f) for f in files_to_process]
+            subprocess.run(["git", "-C", temp_dir, "sparse-checkout", "set", "--no-cone", *patterns], check=True)
+            subprocess.run(["git", "-C", temp_dir, "checkout"], check=True)
+        else:
+            subprocess.run(clone_cmd + [repo_url, temp_dir], check=True)
         dest_dir = os.path.join(os.getcwd(), output_folder)
         if files_to_process:
             for f in files_to_process:
                 full_path = os.path.join(temp_dir, f)
                 if os.path.exists(full_path):
-                    process_file(full_path, dest_folder=dest_dir)
+                    print_result(process_file(full_path, dest_folder=dest_dir))
                 else:
                     print(f"File not found in repo: {f}")
         else:
@@ -146,7 +444,7 @@ if __name__ == "__main__":
 
     if args.file:
         if os.path.isfile(args.file):
-            process_file(args.file, dest_folder=args.output)
+            print_result(process_file(args.file, dest_folder=args.output))
         else:
             print(f"File does not exist: {args.file}")
     elif args.dir:
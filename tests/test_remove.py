@@ -0,0 +1,187 @@
+import os
+import random
+import re as stdlib_re
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import remove
+
+
+# Bytes that exercise every opener/closer, partial markers and invalid UTF-8
+FUZZ_ALPHABET = [b"/", b"*", b"#", b"\n", b"a", b" ", b"<", b"!", b"-", b">", "\u00e9".encode(), b"\xff"]
+STDLIB_PATTERNS = {
+    ext: stdlib_re.compile(b"(?ms)" + pattern)
+    for ext, pattern in remove.COMMENT_PATTERNS.items()
+}
+
+
+def random_sources(seed, count=2000):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield b"".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 40)))
+
+
+class FakeHyperscanDatabase:
+    """Reports every occurrence of each opener, as a literal Hyperscan database does."""
+
+    def __init__(self, delimiters):
+        self.openers = [opener for opener, _ in delimiters]
+
+    def scan(self, data, match_event_handler):
+        for idx, opener in enumerate(self.openers):
+            start = data.find(opener)
+            while start != -1:
+                match_event_handler(idx, 0, start + len(opener), 0, None)
+                start = data.find(opener, start + 1)
+
+
+class HyperscanResolverTest(unittest.TestCase):
+    def setUp(self):
+        fakes = {
+            ext: FakeHyperscanDatabase(delimiters)
+            for ext, delimiters in remove.COMMENT_DELIMITERS.items()
+        }
+        patcher = mock.patch.dict(remove.HYPERSCAN_DATABASES, fakes)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_matches_regex_substitution(self):
+        for ext in remove.COMMENT_DELIMITERS:
+            for source in random_sources(ext):
+                self.assertEqual(
+                    remove.remove_comments_hyperscan(source, ext),
+                    STDLIB_PATTERNS[ext].sub(b"", source),
+                    (ext, source),
+                )
+
+    def test_unterminated_block_openers_are_linear(self):
+        data = b"/* " * 80000
+        started = time.perf_counter()
+        self.assertEqual(remove.remove_comments_hyperscan(data, ".c"), data)
+        self.assertLess(time.perf_counter() - started, 2)
+
+
+@unittest.skipUnless(remove.re.__name__ == "re2", "google-re2 is not installed")
+class Re2EquivalenceTest(unittest.TestCase):
+    def test_matches_stdlib_re(self):
+        for ext in remove.COMMENT_DELIMITERS:
+            for source in random_sources(ext):
+                self.assertEqual(
+                    remove.COMPILED_PATTERNS[ext].sub(b"", source),
+                    STDLIB_PATTERNS[ext].sub(b"", source),
+                    (ext, source),
+                )
+
+
+@unittest.skipUnless(remove.rure is not None, "rure is not installed")
+class RureEquivalenceTest(unittest.TestCase):
+    def test_matches_stdlib_re(self):
+        for ext in remove.COMMENT_DELIMITERS:
+            for source in random_sources(ext):
+                self.assertEqual(
+                    remove.remove_comments_rure(source, ext),
+                    STDLIB_PATTERNS[ext].sub(b"", source),
+                    (ext, source),
+                )
+
+
+class InPlaceMmapTest(unittest.TestCase):
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.tmp.cleanup()
+
+    def test_large_file_with_dest_folder_as_own_directory(self):
+        # "gen.c" vs "./gen.c" is the same file; it must not be mapped and then truncated
+        content = b"int x;\n" * (remove.MMAP_THRESHOLD // 7 + 1)
+        with open("gen.c", "wb") as f:
+            f.write(content)
+
+        remove.remove_comments_other("gen.c", ".c", dest_folder=".")
+
+        with open("gen.c", "rb") as f:
+            self.assertEqual(f.read(), content)
+        with open("gen.c.bak", "rb") as f:
+            self.assertEqual(f.read(), content)
+
+
+class DuplicateBasenameTest(unittest.TestCase):
+    def test_last_walked_file_wins_for_shared_output_name(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "src")
+            dest = os.path.join(tmp, "out")
+            for sub, body in (("a", b"int long_one;\n" * 1000), ("b", b"int b; // c\n")):
+                os.makedirs(os.path.join(src, sub))
+                with open(os.path.join(src, sub, "index.js"), "wb") as f:
+                    f.write(body)
+
+            last = [entry.path for entry in remove.iter_files(src)][-1]
+            with open(last, "rb") as f:
+                expected = remove.remove_comments_from_text(f.read(), ".js")
+
+            remove.process_directory(src, dest_folder=dest)
+
+            with open(os.path.join(dest, "index.js"), "rb") as f:
+                self.assertEqual(f.read(), expected)
+
+
+class BackupTest(unittest.TestCase):
+    def test_backup_falls_back_when_copy_file_range_copies_nothing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "f.c")
+            with open(path, "wb") as f:
+                f.write(b"int x; // c\n")
+
+            with mock.patch.object(remove.os, "copy_file_range", return_value=0, create=True):
+                remove.backup_file(path)
+
+            with open(path + ".bak", "rb") as f:
+                self.assertEqual(f.read(), b"int x; // c\n")
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class GitFilesTest(unittest.TestCase):
+    def test_git_files_are_matched_literally(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = os.path.join(tmp, "repo")
+            os.makedirs(os.path.join(repo, "sub"))
+            os.makedirs(os.path.join(repo, "pages"))
+            for name in ("sub/a.c", "pages/[id].js", "pages/i.js"):
+                with open(os.path.join(repo, name), "w") as f:
+                    f.write("int x; // c\n")
+            git = ["git", "-C", repo, "-c", "user.name=t", "-c", "user.email=t@t"]
+            subprocess.run(["git", "init", "-q", repo], check=True)
+            subprocess.run(git + ["add", "."], check=True)
+            subprocess.run(git + ["commit", "-qm", "init"], check=True)
+
+            out = os.path.join(tmp, "out")
+            remove.process_git_repo(f"file://{repo}", files_to_process=["./sub/a.c", "pages/[id].js"], output_folder=out)
+
+            self.assertEqual(sorted(os.listdir(out)), ["[id].js", "a.c"])
+
+
+@unittest.skipIf(hasattr(os, "geteuid") and os.geteuid() == 0, "root can read any directory")
+class UnreadableDirectoryTest(unittest.TestCase):
+    def test_iter_files_skips_unreadable_subdirectory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            open(os.path.join(tmp, "a.c"), "w").close()
+            locked = os.path.join(tmp, "locked")
+            os.mkdir(locked)
+            os.chmod(locked, 0)
+            try:
+                names = [entry.name for entry in remove.iter_files(tmp)]
+            finally:
+                os.chmod(locked, 0o700)
+        self.assertEqual(names, ["a.c"])
+
+
+if __name__ == "__main__":
+    unittest.main()